@@ -1,28 +1,138 @@
 import os
+import re
+import shutil
+import asyncio
 import logging
+import itertools
+import uuid
+from queue import SimpleQueue, Empty
 from typing import List, Optional, Dict, Any, Union
 from pathlib import Path
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+import orjson
 import torch
 
 from models import WhisperSegment, TranscriptionResponse, ModelInfo, ModelList
 from audio import convert_audio_to_wav, split_audio_into_chunks
-from transcription import load_model, format_srt, format_vtt, transcribe_audio_chunk
+from transcription import load_model, iter_blocks, iter_srt, iter_vtt, transcribe_audio_chunks
 from diarization import Diarizer
 from config import get_config
 
 # Initialize logging
 logger = logging.getLogger(__name__)
 
-# Global variable for model
+# Global variables for models
 asr_model = None
+diarizer_instance = None
+
+# Size of the blocks used when copying uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Unique per worker process, combined with a counter to name temporary uploads
+_WORKER_ID = f"{os.getpid()}_{uuid.uuid4().hex[:8]}"
+_upload_counter = itertools.count()
+
+# Reusable copy buffers, so uploads don't allocate a new block per read
+_BUFFER_POOL: SimpleQueue = SimpleQueue()
+
+# Matches diarization speaker labels (e.g. 'speaker_SPEAKER_00'), capturing the speaker index
+_SPEAKER_LABEL_RE = re.compile(r"speaker_(?:.*_)?(\d+)")
+
+# Speaker labels already parsed into 1-indexed speaker numbers (None when unparseable)
+_speaker_num_cache: Dict[str, Optional[int]] = {}
+
+# Response formats accepted by the transcription endpoint
+_RESPONSE_FORMATS = ("json", "text", "srt", "vtt", "verbose_json")
 
 # Get configuration
 config = get_config()
 
+# Limits how many requests run GPU inference at the same time, created at startup
+# so it binds to the event loop that serves the app
+gpu_semaphore = None
+
+def _speaker_number(speaker_label: str) -> Optional[int]:
+    """
+    Get the 1-indexed speaker number for a diarization label
+
+    Args:
+        speaker_label: Speaker label assigned by the diarizer (e.g. 'speaker_SPEAKER_00')
+
+    Returns:
+        Speaker number (e.g. 1), or None if the label has no numeric suffix
+    """
+    try:
+        return _speaker_num_cache[speaker_label]
+    except KeyError:
+        match = _SPEAKER_LABEL_RE.fullmatch(speaker_label)
+        speaker_num = int(match.group(1)) + 1 if match else None  # Add 1 to make it 1-indexed
+        _speaker_num_cache[speaker_label] = speaker_num
+        return speaker_num
+
+def _json_response(content: Dict[str, Any]) -> Response:
+    """
+    Serialize a JSON response body with orjson, skipping FastAPI's jsonable_encoder pass
+
+    Args:
+        content: JSON-compatible response body
+
+    Returns:
+        Response with the encoded body
+    """
+    return Response(orjson.dumps(content), media_type="application/json")
+
+def _save_upload(source, destination: Path) -> None:
+    """
+    Copy an uploaded file object to disk in fixed-size blocks
+
+    Args:
+        source: File object of the upload
+        destination: Path to write the upload to
+    """
+    readinto = getattr(source, "readinto", None)
+    if readinto is None:
+        with open(destination, "wb") as f:
+            shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
+        return
+
+    try:
+        buffer = _BUFFER_POOL.get_nowait()
+    except Empty:
+        buffer = bytearray(UPLOAD_CHUNK_SIZE)
+
+    try:
+        with memoryview(buffer) as view, open(destination, "wb") as f:
+            # Read straight into the pooled buffer and write out only the filled part
+            while n := readinto(buffer):
+                f.write(view[:n])
+    finally:
+        _BUFFER_POOL.put(buffer)
+
+def _cleanup_files(temp_file: Optional[Path], wav_file: Optional[str], audio_chunks: List[str]) -> None:
+    """
+    Remove the temporary files created while processing a request, ignoring errors
+
+    Args:
+        temp_file: Path to the saved upload, if it was created
+        wav_file: Path to the converted WAV file, if it was created
+        audio_chunks: Paths to the audio chunks
+    """
+    for path in (temp_file, wav_file):
+        if path is None:
+            continue
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    # Chunks are written to their own temporary directory, so remove it in one go
+    if audio_chunks and audio_chunks != [wav_file]:
+        shutil.rmtree(os.path.dirname(audio_chunks[0]), ignore_errors=True)
+
 def create_app() -> FastAPI:
     """
     Create and configure the FastAPI application
@@ -44,7 +154,9 @@ def create_app() -> FastAPI:
     @app.on_event("startup")
     async def startup_event():
         """Initialize resources during startup"""
-        global asr_model
+        global asr_model, diarizer_instance, gpu_semaphore
+
+        gpu_semaphore = asyncio.Semaphore(config.gpu_concurrency)
 
         try:
             # Check CUDA availability
@@ -55,13 +167,20 @@ def create_app() -> FastAPI:
 
             # Load the ASR model
             model_id = config.model_id
-            asr_model = load_model(model_id)
+            asr_model = load_model(
+                model_id,
+                use_cuda_graphs=config.use_cuda_graphs,
+                compile_encoder=config.compile_encoder,
+                compute_type=config.compute_type
+            )
             logger.info(f"Model {model_id} loaded successfully")
 
             # Initialize diarization if token is available
             hf_token = config.get_hf_token()
             if hf_token:
                 logger.info("HuggingFace access token found, speaker diarization will be available")
+                # Load the pipeline once and share it across requests
+                diarizer_instance = Diarizer(access_token=hf_token)
             else:
                 logger.info("No HuggingFace access token, speaker diarization will be disabled")
 
@@ -71,6 +190,7 @@ def create_app() -> FastAPI:
 
     @app.post("/v1/audio/transcriptions")
     async def transcribe_audio(
+        background_tasks: BackgroundTasks,
         file: UploadFile = File(...),
         model: str = Form("whisper-1"),
         language: Optional[str] = Form(None),
@@ -95,60 +215,81 @@ def create_app() -> FastAPI:
         if not asr_model:
             raise HTTPException(status_code=503, detail="Model not loaded yet. Please try again in a few moments.")
 
+        # Reject unsupported formats before any files are written
+        if response_format not in _RESPONSE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported response format: {response_format}")
+
         # Process parameters
         logger.info(f"Transcription requested: {file.filename}, format: {response_format}")
 
+        # Temporary files created so far, removed on failure or after the response is sent
+        temp_file = None
+        wav_file = None
+        audio_chunks = []
+
         try:
             # Save uploaded file to temp location
             temp_dir = Path(config.temp_dir)
             temp_dir.mkdir(parents=True, exist_ok=True)
 
-            temp_file = temp_dir / f"upload_{os.urandom(8).hex()}{Path(file.filename).suffix}"
-            with open(temp_file, "wb") as f:
-                content = await file.read()
-                f.write(content)
+            temp_file = temp_dir / f"upload_{_WORKER_ID}_{next(_upload_counter)}{Path(file.filename).suffix}"
+            # Write the upload from a worker thread so disk I/O doesn't block the event loop
+            await run_in_threadpool(_save_upload, file.file, temp_file)
 
-            # Convert to WAV format
-            wav_file = convert_audio_to_wav(str(temp_file))
+            # Convert to WAV format in a worker thread, decoding a long upload would stall the event loop
+            wav_file, audio_duration = await run_in_threadpool(convert_audio_to_wav, str(temp_file))
 
             # Split audio into chunks if it's too long
             chunk_duration = config.chunk_duration
-            audio_chunks = split_audio_into_chunks(wav_file, chunk_duration=chunk_duration)
+            audio_chunks = split_audio_into_chunks(wav_file, chunk_duration=chunk_duration,
+                                                   duration=audio_duration)
 
             # Initialize diarization if requested
             diarizer = None
             if diarize:
-                hf_token = config.get_hf_token()
-                if hf_token:
-                    diarizer = Diarizer(access_token=hf_token)
+                if diarizer_instance:
+                    diarizer = diarizer_instance
                 else:
                     logger.warning("Diarization requested but no HuggingFace token available")
 
-            # Process speaker diarization if requested
-            diarization_result = None
-            if diarizer:
-                logger.info("Performing speaker diarization")
-                diarization_result = diarizer.diarize(wav_file)
-                logger.info(f"Diarization found {diarization_result.num_speakers} speakers")
+            # Hold the GPU for this request's inference so concurrent requests don't contend for it
+            async with gpu_semaphore:
+                # Start speaker diarization in the background so it overlaps with transcription
+                diarization_task = None
+                if diarizer:
+                    logger.info("Performing speaker diarization")
+                    diarization_task = asyncio.ensure_future(run_in_threadpool(diarizer.diarize, wav_file))
+
+                # Transcribe the chunks in batches, consuming the results in a worker thread
+                logger.info(f"Transcribing {len(audio_chunks)} chunk(s)")
+                chunk_results = await run_in_threadpool(list, transcribe_audio_chunks(
+                    asr_model,
+                    audio_chunks,
+                    language=language,
+                    word_timestamps=word_timestamps,
+                    batch_size=config.batch_size
+                ))
+
+                # Wait for speaker diarization to finish
+                diarization_result = None
+                if diarization_task:
+                    diarization_result = await diarization_task
+                    logger.info(f"Diarization found {diarization_result.num_speakers} speakers")
 
             # Process each chunk
             all_text = []
             all_segments = []
 
-            for i, chunk_path in enumerate(audio_chunks):
-                logger.info(f"Processing chunk {i+1}/{len(audio_chunks)}")
-
-                # Transcribe the chunk
-                chunk_text, chunk_segments = transcribe_audio_chunk(
-                    asr_model,
-                    chunk_path,
-                    language=language,
-                    word_timestamps=word_timestamps
-                )
+            for i, (_, chunk_text, chunk_segments) in enumerate(chunk_results):
+                # Drop anything the model produced in the silence padding the last chunk
+                offset = i * chunk_duration
+                valid_duration = audio_duration - offset
+                chunk_segments = [segment for segment in chunk_segments if segment.start < valid_duration]
+                for segment in chunk_segments:
+                    segment.end = min(segment.end, valid_duration)
 
                 # Add offset to timestamps if not the first chunk
                 if i > 0:
-                    offset = i * chunk_duration
                     for segment in chunk_segments:
                         segment.start += offset
                         segment.end += offset
@@ -156,8 +297,8 @@ def create_app() -> FastAPI:
                 all_text.append(chunk_text)
                 all_segments.extend(chunk_segments)
 
-            # Combine results
-            full_text = " ".join(all_text)
+            # Combined text is built once below, with or without speaker labels
+            full_text = None
 
             # Apply diarization if available
             if diarizer and diarization_result and diarization_result.segments:
@@ -175,17 +316,23 @@ def create_app() -> FastAPI:
                     # Track which speakers we've seen before
                     seen_speakers = set()
 
-                    # Process segments to include speaker info in the text field
+                    # Process segments to include speaker info in the text field,
+                    # collecting the full text in the same pass
+                    text_parts = []
                     for segment in all_segments:
+                        prefix = ""
                         if hasattr(segment, 'speaker') and segment.speaker:
                             # Extract speaker number (e.g., 'speaker_SPEAKER_00' -> '1')
                             speaker_label = segment.speaker
                             if speaker_label.startswith("speaker_"):
-                                try:
-                                    # Extract speaker number from the label
-                                    parts = speaker_label.split("_")
-                                    speaker_num = int(parts[-1]) + 1  # Add 1 to make it 1-indexed
+                                speaker_num = _speaker_number(speaker_label)
 
+                                if speaker_num is None:
+                                    # If parsing fails, use a generic label
+                                    if "Speaker" != previous_speaker:
+                                        prefix = "Speaker: "
+                                        previous_speaker = "Speaker"
+                                else:
                                     # Only add speaker prefix if this is a different speaker than the previous one
                                     if speaker_label != previous_speaker:
                                         # First time seeing this speaker
@@ -196,59 +343,53 @@ def create_app() -> FastAPI:
                                             # We've seen this speaker before
                                             prefix = f"{speaker_num}: "
 
-                                        segment.text = f"{prefix}{segment.text}"
-
                                     previous_speaker = speaker_label
 
-                                except (ValueError, IndexError):
-                                    # If parsing fails, use a generic label
-                                    if "Speaker" != previous_speaker:
-                                        segment.text = f"Speaker: {segment.text}"
-                                        previous_speaker = "Speaker"
+                        # Only rewrite the segments that actually get a prefix
+                        if prefix:
+                            segment.text = f"{prefix}{segment.text}"
+                        text_parts.append(segment.text)
 
-                    # Reconstruct full text with speaker labels
-                    full_text = " ".join(segment.text for segment in all_segments)
+                    # Full text with speaker labels
+                    full_text = " ".join(text_parts)
                     logger.info(f"Speaker diarization applied to {len(all_segments)} segments and included in text")
                 else:
                     logger.info("Speaker diarization applied to segments but not included in text")
             else:
                 logger.warning("Diarization not applied or returned no speakers")
 
+            # Combine results
+            if full_text is None:
+                full_text = " ".join(all_text)
 
             # Create response
             response = TranscriptionResponse(
                 text=full_text,
-                segments=all_segments if timestamps or response_format == "verbose_json" else None,
+                segments=[WhisperSegment.from_segment(segment) for segment in all_segments] if timestamps or response_format == "verbose_json" else None,
                 language=language,
                 duration=sum(len(segment.text.split()) for segment in all_segments) / 150 if all_segments else 0,
                 model="parakeet-tdt-0.6b-v3"
             )
 
-            # Clean up temporary files
-            if os.path.exists(temp_file):
-                os.unlink(temp_file)
-            if wav_file != str(temp_file) and os.path.exists(wav_file):
-                os.unlink(wav_file)
-            for chunk in audio_chunks:
-                if chunk != wav_file and os.path.exists(chunk):
-                    os.unlink(chunk)
-
-            # Return in requested format
-            if response_format == "json":
-                return response.dict()
-            elif response_format == "text":
-                return PlainTextResponse(full_text)
+            # Build the response in the requested format (validated above)
+            if response_format == "text":
+                result = PlainTextResponse(full_text)
             elif response_format == "srt":
-                return PlainTextResponse(format_srt(all_segments))
+                result = StreamingResponse(iter_blocks(iter_srt(all_segments)), media_type="text/plain")
             elif response_format == "vtt":
-                return PlainTextResponse(format_vtt(all_segments))
-            elif response_format == "verbose_json":
-                return response.dict()
+                result = StreamingResponse(iter_blocks(iter_vtt(all_segments)), media_type="text/plain")
             else:
-                raise HTTPException(status_code=400, detail=f"Unsupported response format: {response_format}")
+                result = _json_response(response.model_dump())
+
+            # Clean up temporary files after the response has been sent. Background tasks
+            # only run for a returned response, so this must stay the last step before returning
+            background_tasks.add_task(_cleanup_files, temp_file, wav_file, audio_chunks)
+            return result
 
         except Exception as e:
             logger.error(f"Error during transcription: {str(e)}")
+            # The cleanup task was never handed to a response, so remove the files now
+            _cleanup_files(temp_file, wav_file, audio_chunks)
             raise HTTPException(status_code=500, detail=str(e))
 
     @app.get("/health")
@@ -3,30 +3,55 @@ import tempfile
 import logging
 import subprocess
 import math
+import glob
 import wave
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, Tuple
 from pathlib import Path
 
+import soundfile as sf
+
 logger = logging.getLogger(__name__)
 
-def split_audio_into_chunks(audio_path: str, chunk_duration: int = 300) -> List[str]:
+try:
+    # PyAV decodes and resamples in-process, avoiding an ffmpeg subprocess per request
+    import av
+except ImportError:
+    av = None
+    logger.warning("PyAV not installed. Falling back to the ffmpeg command line for audio conversion.")
+
+def get_audio_duration(audio_path: str) -> float:
+    """
+    Get the duration of an audio file from its header
+
+    Args:
+        audio_path: Path to the audio file
+
+    Returns:
+        Duration in seconds
+    """
+    return sf.info(audio_path).duration
+
+def split_audio_into_chunks(audio_path: str, chunk_duration: int = 300,
+                            duration: Optional[float] = None) -> List[str]:
     """
     Split a long audio file into smaller chunks for processing.
+
+    Every chunk is exactly chunk_duration seconds long, with the last one padded
+    with silence, so the model always sees the same input shape.
     
     Args:
         audio_path: Path to the audio file
         chunk_duration: Duration of each chunk in seconds (default: 5 minutes)
+        duration: Duration of the audio in seconds, if already known
         
     Returns:
         List of paths to the chunked audio files
     """
     try:
-        # Check audio duration using wave module
-        with wave.open(audio_path, 'rb') as wf:
-            frames = wf.getnframes()
-            rate = wf.getframerate()
-            duration = frames / rate
-            
+        # Check audio duration from the file header unless the caller already knows it
+        if duration is None:
+            duration = get_audio_duration(audio_path)
+
         logger.info(f"Audio duration: {duration:.2f} seconds")
         
         # If duration is less than chunk_duration, no need to split
@@ -40,35 +65,34 @@ def split_audio_into_chunks(audio_path: str, chunk_duration: int = 300) -> List[
         
         # Create temporary directory for chunks
         temp_dir = tempfile.mkdtemp()
-        chunk_paths = []
-        
-        # Process each chunk
-        for i in range(num_chunks):
-            start_time = i * chunk_duration
-            output_path = os.path.join(temp_dir, f"chunk_{i}.wav")
-            
-            # Use ffmpeg to extract chunk
-            cmd = [
-                "ffmpeg",
-                "-y",  # Overwrite output files
-                "-ss", str(start_time),  # Start time
-                "-i", audio_path,  # Input file
-                "-t", str(chunk_duration),  # Duration to extract
-                "-c:a", "pcm_s16le",  # Audio codec
-                "-ar", "16000",  # Sample rate
-                "-ac", "1",  # Mono audio
-                output_path
-            ]
-            
-            logger.debug(f"Running ffmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"Error splitting audio chunk {i}: {result.stderr}")
-                raise Exception(f"Failed to split audio: {result.stderr}")
-                
-            chunk_paths.append(output_path)
-            
+        output_pattern = os.path.join(temp_dir, "chunk_%03d.wav")
+
+        # Use ffmpeg's segment muxer to write every chunk in a single pass
+        cmd = [
+            "ffmpeg",
+            "-y",  # Overwrite output files
+            "-i", audio_path,  # Input file
+            "-f", "segment",  # Split the output into segments
+            "-segment_time", str(chunk_duration),  # Duration of each segment
+            "-reset_timestamps", "1",  # Start each segment at timestamp 0
+            "-af", f"apad=whole_dur={num_chunks * chunk_duration}",  # Pad the last chunk to full length
+            "-c:a", "pcm_s16le",  # Audio codec
+            "-ar", "16000",  # Sample rate
+            "-ac", "1",  # Mono audio
+            output_pattern
+        ]
+
+        logger.debug(f"Running ffmpeg command: {' '.join(cmd)}")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+
+        if result.returncode != 0:
+            logger.error(f"Error splitting audio: {result.stderr}")
+            raise Exception(f"Failed to split audio: {result.stderr}")
+
+        chunk_paths = sorted(glob.glob(os.path.join(temp_dir, "chunk_*.wav")))
+        if not chunk_paths:
+            raise Exception("ffmpeg produced no audio chunks")
+
         return chunk_paths
         
     except Exception as e:
@@ -76,7 +100,56 @@ def split_audio_into_chunks(audio_path: str, chunk_duration: int = 300) -> List[
         # If there's an error, return the original file
         return [audio_path]
 
-def convert_audio_to_wav(audio_path: str) -> str:
+def _decode_to_wav(audio_path: str, output_path: str) -> float:
+    """
+    Decode an audio file with PyAV and write it as WAV (16kHz, mono, 16-bit PCM)
+
+    Args:
+        audio_path: Path to the audio file
+        output_path: Path to write the WAV file to
+
+    Returns:
+        Duration of the written audio in seconds
+    """
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=16000)
+
+    with av.open(audio_path) as container, wave.open(output_path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+
+        # writeframesraw skips the per-call RIFF header rewrite, close() patches it once
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                wf.writeframesraw(resampled.to_ndarray().tobytes())
+
+        # Flush any samples still buffered in the resampler
+        for resampled in resampler.resample(None):
+            wf.writeframesraw(resampled.to_ndarray().tobytes())
+
+        return wf.getnframes() / 16000
+
+def _parse_progress_duration(progress: str) -> Optional[float]:
+    """
+    Get the output duration from ffmpeg's -progress report
+
+    Args:
+        progress: Text written by ffmpeg with -progress pipe:1
+
+    Returns:
+        Duration in seconds, or None if the report doesn't contain one
+    """
+    duration = None
+    for line in progress.splitlines():
+        key, _, value = line.partition("=")
+        if key == "out_time_us":
+            try:
+                duration = int(value) / 1_000_000
+            except ValueError:
+                pass
+    return duration
+
+def convert_audio_to_wav(audio_path: str) -> Tuple[str, float]:
     """
     Convert any audio format to WAV format (16kHz, mono, 16-bit PCM)
     
@@ -84,7 +157,7 @@ def convert_audio_to_wav(audio_path: str) -> str:
         audio_path: Path to the audio file
         
     Returns:
-        Path to the converted WAV file
+        Tuple of (path to the converted WAV file, duration in seconds)
     """
     # Create temporary file
     temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
@@ -92,6 +165,11 @@ def convert_audio_to_wav(audio_path: str) -> str:
     output_path = temp_file.name
     
     try:
+        if av is not None:
+            logger.debug(f"Decoding {audio_path} with PyAV")
+            duration = _decode_to_wav(audio_path, output_path)
+            return output_path, duration
+
         # Use ffmpeg to convert audio
         cmd = [
             "ffmpeg",
@@ -100,6 +178,7 @@ def convert_audio_to_wav(audio_path: str) -> str:
             "-c:a", "pcm_s16le",  # Audio codec (16-bit PCM)
             "-ar", "16000",  # Sample rate (16kHz)
             "-ac", "1",  # Mono audio
+            "-progress", "pipe:1",  # Report the output duration on stdout
             output_path
         ]
         
@@ -109,8 +188,12 @@ def convert_audio_to_wav(audio_path: str) -> str:
         if result.returncode != 0:
             logger.error(f"Error converting audio: {result.stderr}")
             raise Exception(f"Failed to convert audio: {result.stderr}")
+
+        duration = _parse_progress_duration(result.stdout)
+        if duration is None:
+            duration = get_audio_duration(output_path)
             
-        return output_path
+        return output_path, duration
         
     except Exception as e:
         logger.error(f"Error converting audio: {str(e)}")
@@ -26,6 +26,11 @@ DEBUG_MODE = os.environ.get("DEBUG", "0") == "1"
 DEFAULT_MODEL_ID = "nvidia/parakeet-tdt-0.6b-v3"
 DEFAULT_TEMPERATURE = 0.0
 DEFAULT_CHUNK_DURATION = 500  # 5 minutes in seconds
+DEFAULT_BATCH_SIZE = 4  # Number of chunks transcribed per forward pass
+DEFAULT_USE_CUDA_GRAPHS = True  # Decode with CUDA graphs on GPU
+DEFAULT_COMPILE_ENCODER = False  # Compile the encoder with torch.compile on GPU
+DEFAULT_COMPUTE_TYPE = "auto"  # Model weight precision (auto, float32, float16, bfloat16 or int8)
+DEFAULT_GPU_CONCURRENCY = 1  # Number of requests allowed to run inference at the same time
 
 # Hugging Face configuration
 HF_TOKEN = os.environ.get("HUGGINGFACE_ACCESS_TOKEN")
@@ -59,6 +64,11 @@ class Config:
         self.model_id = os.environ.get("MODEL_ID", DEFAULT_MODEL_ID)
         self.temperature = float(os.environ.get("TEMPERATURE", DEFAULT_TEMPERATURE))
         self.chunk_duration = int(os.environ.get("CHUNK_DURATION", DEFAULT_CHUNK_DURATION))
+        self.batch_size = int(os.environ.get("BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.use_cuda_graphs = os.environ.get("USE_CUDA_GRAPHS", str(DEFAULT_USE_CUDA_GRAPHS)).lower() == "true"
+        self.compile_encoder = os.environ.get("COMPILE_ENCODER", str(DEFAULT_COMPILE_ENCODER)).lower() == "true"
+        self.compute_type = os.environ.get("COMPUTE_TYPE", DEFAULT_COMPUTE_TYPE).lower()
+        self.gpu_concurrency = int(os.environ.get("GPU_CONCURRENCY", DEFAULT_GPU_CONCURRENCY))
 
         # Diarization settings
         self.hf_token = HF_TOKEN
@@ -91,6 +101,11 @@ class Config:
             "model_id": self.model_id,
             "temperature": self.temperature,
             "chunk_duration": self.chunk_duration,
+            "batch_size": self.batch_size,
+            "use_cuda_graphs": self.use_cuda_graphs,
+            "compile_encoder": self.compile_encoder,
+            "compute_type": self.compute_type,
+            "gpu_concurrency": self.gpu_concurrency,
             "enable_diarization": self.enable_diarization,
             "include_diarization_in_text": self.include_diarization_in_text,
             "has_hf_token": self.hf_token is not None
@@ -5,7 +5,10 @@ from typing import Dict, List, Optional, Tuple, Union
 import os
 import logging
 import tempfile
+import threading
+from contextlib import nullcontext
 import numpy as np
+import soundfile as sf
 import torch
 from pydantic import BaseModel
 
@@ -29,6 +32,10 @@ class Diarizer:
         self.pipeline = None
         self.access_token = access_token
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # Dedicated CUDA stream so diarization kernels can interleave with ASR inference
+        self.stream = torch.cuda.Stream() if self.device == "cuda" else None
+        # The pipeline is shared across requests, so only one diarization runs at a time
+        self._lock = threading.Lock()
         self._initialize()
 
     def _initialize(self):
@@ -75,11 +82,20 @@ class Diarizer:
             return DiarizationResult(segments=[], num_speakers=0)
 
         try:
-            # Run the diarization pipeline
-            diarization = self.pipeline(
-                audio_path,
-                num_speakers=num_speakers
-            )
+            # Decode the audio once and give the pipeline an in-memory waveform, so its
+            # sliding windows are sliced from memory instead of re-read from disk
+            samples, sample_rate = sf.read(audio_path, dtype="float32", always_2d=True)
+            waveform = torch.from_numpy(np.ascontiguousarray(samples.T))  # (channel, time)
+
+            # Run the diarization pipeline on its own CUDA stream
+            with self._lock:
+                with torch.cuda.stream(self.stream) if self.stream is not None else nullcontext():
+                    diarization = self.pipeline(
+                        {"waveform": waveform, "sample_rate": sample_rate},
+                        num_speakers=num_speakers
+                    )
+                if self.stream is not None:
+                    self.stream.synchronize()
 
             # Convert to our format
             segments = []
@@ -119,6 +135,10 @@ class Diarizer:
         """
         Merge diarization results with transcription segments
 
+        Each segment gets the speaker whose turns overlap it the longest in total. Ties go to
+        the speaker with the earliest overlapping turn, and segments without any overlap are
+        labelled 'unknown'.
+
         Args:
             diarization: Speaker diarization result
             transcription_segments: List of transcription segments with start/end times
@@ -130,30 +150,39 @@ class Diarizer:
         if not diarization.segments:
             return transcription_segments
 
-        # For each transcription segment, find the dominant speaker
-        for segment in transcription_segments:
-            # Get segment time bounds
-            start = segment.start
-            end = segment.end
+        # Build interval arrays once, sorted by start time, with the running maximum of the
+        # end times so everything before a given index is known to end before that point
+        speaker_segments = sorted(diarization.segments, key=lambda x: x.start)
+        spk_starts = np.array([spk_segment.start for spk_segment in speaker_segments])
+        spk_ends = np.array([spk_segment.end for spk_segment in speaker_segments])
+        max_ends = np.maximum.accumulate(spk_ends)
+
+        # Encode speaker labels as small integers so per-speaker sums stay in NumPy
+        speakers, spk_ids = np.unique([spk_segment.speaker for spk_segment in speaker_segments],
+                                      return_inverse=True)
 
-            # Find overlapping diarization segments
-            overlapping = []
-            for spk_segment in diarization.segments:
-                # Calculate overlap
-                overlap_start = max(start, spk_segment.start)
-                overlap_end = min(end, spk_segment.end)
+        # For every transcription segment, find the window of diarization segments that can overlap it
+        starts = np.array([segment.start for segment in transcription_segments], dtype=float)
+        ends = np.array([segment.end for segment in transcription_segments], dtype=float)
+        lower = np.searchsorted(max_ends, starts, side="right")
+        upper = np.searchsorted(spk_starts, ends, side="left")
 
-                if overlap_end > overlap_start:
-                    # There is an overlap
-                    duration = overlap_end - overlap_start
-                    overlapping.append((spk_segment.speaker, duration))
+        for segment, start, end, lo, hi in zip(transcription_segments, starts, ends, lower, upper):
+            # Calculate the overlap with each diarization segment in the window
+            overlap = np.minimum(end, spk_ends[lo:hi]) - np.maximum(start, spk_starts[lo:hi])
+            np.maximum(overlap, 0.0, out=overlap)
 
             # Assign the speaker with most overlap
-            if overlapping:
-                # Sort by duration (descending)
-                overlapping.sort(key=lambda x: x[1], reverse=True)
-                # Assign the dominant speaker
-                setattr(segment, "speaker", overlapping[0][0])
+            window_ids = spk_ids[lo:hi]
+            totals = np.bincount(window_ids, weights=overlap, minlength=len(speakers))
+            best = totals.argmax()
+            tied = totals == totals[best]
+            if totals[best] > 0 and np.count_nonzero(tied) > 1:
+                # Break ties in favour of the speaker of the earliest overlapping turn
+                # rather than the lowest label, which argmax alone would pick
+                best = window_ids[np.flatnonzero((overlap > 0) & tied[window_ids])[0]]
+            if totals[best] > 0:
+                setattr(segment, "speaker", str(speakers[best]))
             else:
                 # No overlap found, assign unknown
                 setattr(segment, "speaker", "unknown")
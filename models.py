@@ -1,5 +1,15 @@
+from dataclasses import dataclass, asdict
 from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+@dataclass(slots=True)
+class Segment:
+    """Lightweight segment used internally while a transcription is processed"""
+    id: int
+    start: float
+    end: float
+    text: str
+    speaker: Optional[str] = None  # For speaker diarization
 
 class WhisperSegment(BaseModel):
     """Represents a segment in the transcription"""
@@ -15,6 +25,11 @@ class WhisperSegment(BaseModel):
     no_speech_prob: float = 0.1
     speaker: Optional[str] = None  # For speaker diarization
 
+    @classmethod
+    def from_segment(cls, segment: Segment) -> "WhisperSegment":
+        """Build a response segment from an internal segment without re-validating it"""
+        return cls.model_construct(**asdict(segment))
+
 class TranscriptionResponse(BaseModel):
     """Represents the response format for transcription"""
     text: str
@@ -24,13 +39,12 @@ class TranscriptionResponse(BaseModel):
     duration: Optional[float] = None
     model: Optional[str] = None
     
-    class Config:
-        schema_extra = {"example": {"text": "Hello world", "segments": []}}
+    model_config = ConfigDict(json_schema_extra={"example": {"text": "Hello world", "segments": []}})
     
-    def dict(self, **kwargs):
-        """Custom dict method to handle response format"""
+    def model_dump(self, **kwargs):
+        """Custom dump method to handle response format"""
         # If we don't need segments, remove them
-        result = super().dict(**kwargs)
+        result = super().model_dump(**kwargs)
         if not self.segments:
             result.pop("segments", None)
         return result
@@ -3,11 +3,69 @@ import os
 import sys
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from pprint import pprint
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
+try:
+    # Streams the upload from disk instead of building the whole multipart body in memory
+    from requests_toolbelt import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
+try:
+    # Parses large verbose_json responses several times faster than the json module
+    import orjson
+except ImportError:
+    orjson = None
+
+# Size of the blocks read from the audio file while uploading
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Size of the blocks read from streamed responses
+RESPONSE_BLOCK_SIZE = 1 << 16
+
+# Seconds to wait on any request, so a stuck server cannot hang the script
+REQUEST_TIMEOUT = 600
+
+class BlockReader:
+    """Wraps a MultipartEncoder so the HTTP client pulls the body in large blocks"""
+
+    def __init__(self, encoder, block_size=UPLOAD_BLOCK_SIZE):
+        self.encoder = encoder
+        self.block_size = block_size
+
+    def __len__(self):
+        return self.encoder.len
+
+    def read(self, size=-1):
+        # Ignore the client's small default block size
+        return self.encoder.read(self.block_size)
+
+def read_json(response):
+    """Read a streamed JSON response body in large blocks and parse it"""
+    body = bytearray()
+    for block in response.iter_content(RESPONSE_BLOCK_SIZE):
+        body += block
+    if orjson is None:
+        return json.loads(body)
+    return orjson.loads(body)
+
+def post_audio(post, api_url, audio_path, f, params):
+    """POST an open audio file with form parameters, streaming the body when possible"""
+    file_field = (audio_path.name, f, f"audio/{audio_path.suffix[1:]}")
+    if MultipartEncoder is None:
+        return post(api_url, files={"file": file_field}, data=params, stream=True,
+                    timeout=REQUEST_TIMEOUT)
+
+    encoder = MultipartEncoder(fields={"file": file_field, **{k: str(v) for k, v in params.items()}})
+    return post(api_url, data=BlockReader(encoder), headers={"Content-Type": encoder.content_type},
+                stream=True, timeout=REQUEST_TIMEOUT)
+
 def main():
     parser = argparse.ArgumentParser(description="Test the Parakeet Whisper-Compatible API")
     parser.add_argument("--file", required=True, help="Path to audio file to transcribe")
@@ -50,78 +108,109 @@ def main():
         }
     ]
     
-    # Run tests
-    for test in test_cases:
-        print(f"\n\nRunning test: {test['name']}")
-        print("-" * 80)
-        
-        try:
-            # Prepare the file and form data
-            with open(audio_path, "rb") as f:
-                files = {"file": (audio_path.name, f, f"audio/{audio_path.suffix[1:]}")}
-                
-                # Add form parameters
-                start_time = time.time()
-                response = requests.post(api_url, files=files, data=test["params"])
-                elapsed = time.time() - start_time
-                
-                print(f"Status code: {response.status_code}")
-                print(f"Time taken: {elapsed:.2f} seconds")
-                
-                if response.status_code == 200:
-                    content_type = response.headers.get("Content-Type", "")
-                    
-                    if "json" in content_type:
-                        result = response.json()
-                        # Pretty print with truncated text
-                        if "text" in result and len(result["text"]) > 100:
-                            text_preview = result["text"][:100] + "..."
-                            result_copy = result.copy()
-                            result_copy["text"] = text_preview
-                            pprint(result_copy)
-                            print(f"\nFull text ({len(result['text'])} chars):")
-                            print(result["text"])
-                        else:
-                            pprint(result)
-                            
-                        # Check if segments exist
-                        if "segments" in result:
-                            print(f"\nFound {len(result['segments'])} segments")
-                            if result["segments"]:
-                                print("First segment:")
-                                pprint(result["segments"][0])
-                    else:
-                        # For text formats, print a preview
-                        text = response.text
-                        print(f"Response text preview ({len(text)} chars):")
-                        print(text[:500] + ("..." if len(text) > 500 else ""))
-                else:
-                    print(f"Error response: {response.text}")
-        
-        except Exception as e:
-            print(f"Error during test: {str(e)}")
-    
-    # Test health endpoint
-    print("\n\nTesting /health endpoint")
-    print("-" * 80)
+    # Reuse pooled keep-alive connections across all requests
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8,
+                              max_retries=Retry(total=2, backoff_factor=0.1))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        run_tests(session, args, api_url, audio_path, test_cases)
+
+def run_one(post, api_url, audio_path, test):
+    """Run a single transcription test case, returning (name, status, elapsed, payload)"""
     try:
-        response = requests.get(f"{args.url}/health")
-        print(f"Status code: {response.status_code}")
-        if response.status_code == 200:
-            pprint(response.json())
+        # Prepare the file and form data
+        with open(audio_path, "rb") as f:
+            # Add form parameters
+            start_time = time.time()
+            response = post_audio(post, api_url, audio_path, f, test["params"])
+            elapsed = time.time() - start_time
+        return test["name"], response.status_code, elapsed, response
     except Exception as e:
-        print(f"Error during health check: {str(e)}")
+        return test["name"], None, None, e
+
+def print_result(name, status, elapsed, payload):
+    """Print the outcome of a transcription test case"""
+    print(f"\n\nRunning test: {name}")
+    print("-" * 80)
+    
+    try:
+        if status is None:
+            raise payload
+
+        response = payload
+        print(f"Status code: {status}")
+        print(f"Time taken: {elapsed:.2f} seconds")
         
-    # Test models endpoint
-    print("\n\nTesting /v1/models endpoint")
+        if status == 200:
+            content_type = response.headers.get("Content-Type", "")
+            
+            if "json" in content_type:
+                result = read_json(response)
+                # Print a field-level summary, pretty printing the whole tree is slow on long transcripts
+                text = result.get("text", "")
+                segments = result.get("segments", [])
+                print(f"language={result.get('language')!r} duration={result.get('duration')} "
+                      f"text_len={len(text)} n_segments={len(segments)}")
+                print(text[:100] + ("..." if len(text) > 100 else ""))
+
+                # Only inspect the first segment
+                if segments:
+                    print("First segment:")
+                    pprint(segments[0])
+            else:
+                # For text formats, print a preview
+                text = response.text
+                print(f"Response text preview ({len(text)} chars):")
+                print(text[:500] + ("..." if len(text) > 500 else ""))
+        else:
+            print(f"Error response: {response.text}")
+
+    except Exception as e:
+        print(f"Error during test: {str(e)}")
+
+def run_probe(get, url):
+    """GET a status endpoint, returning (status, payload)"""
+    try:
+        response = get(url, timeout=REQUEST_TIMEOUT)
+        return response.status_code, response
+    except Exception as e:
+        return None, e
+
+def print_probe(path, label, status, payload):
+    """Print the outcome of a status endpoint probe"""
+    print(f"\n\nTesting {path} endpoint")
     print("-" * 80)
     try:
-        response = requests.get(f"{args.url}/v1/models")
-        print(f"Status code: {response.status_code}")
-        if response.status_code == 200:
-            pprint(response.json())
+        if status is None:
+            raise payload
+
+        print(f"Status code: {status}")
+        if status == 200:
+            pprint(payload.json())
     except Exception as e:
-        print(f"Error during models check: {str(e)}")
+        print(f"Error during {label}: {str(e)}")
+
+def run_tests(session, args, api_url, audio_path, test_cases):
+    """Run the transcription test cases and probe the health and models endpoints"""
+    # Resolve the bound methods once for every request in the run
+    post = session.post
+    get = session.get
+
+    probes = [("/health", "health check"), ("/v1/models", "models check")]
+
+    # Run every request concurrently so their round trips overlap
+    with ThreadPoolExecutor(max_workers=len(test_cases) + len(probes)) as executor:
+        futures = [executor.submit(run_one, post, api_url, audio_path, test) for test in test_cases]
+        probe_futures = [executor.submit(run_probe, get, f"{args.url}{path}") for path, _ in probes]
+
+        # Print each transcription once it has finished
+        for future in as_completed(futures):
+            print_result(*future.result())
+
+        # The probes are fast, print them afterwards in a fixed order
+        for (path, label), future in zip(probes, probe_futures):
+            print_probe(path, label, *future.result())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
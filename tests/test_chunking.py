@@ -3,7 +3,7 @@ import tempfile
 import unittest
 import subprocess
 from unittest.mock import patch, MagicMock
-import wave
+import struct
 import numpy as np
 
 # Import the function to test
@@ -13,23 +13,49 @@ from audio import split_audio_into_chunks
 
 
 class TestAudioChunking(unittest.TestCase):
-    def create_test_wav(self, duration_seconds=10, sample_rate=16000):
-        """Create a test WAV file with the specified duration"""
+    @classmethod
+    def setUpClass(cls):
+        # Test WAV files keyed by (duration_seconds, sample_rate), shared across tests
+        cls._wav_cache = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        # Clean up
+        for path in cls._wav_cache.values():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def create_test_wav(cls, duration_seconds=10, sample_rate=16000):
+        """Create a test WAV file with the specified duration, reusing one already built"""
+        key = (duration_seconds, sample_rate)
+        if key not in cls._wav_cache:
+            cls._wav_cache[key] = cls._build_test_wav(duration_seconds, sample_rate)
+        return cls._wav_cache[key]
+
+    @staticmethod
+    def _build_test_wav(duration_seconds, sample_rate):
+        """Write a test WAV file with the specified duration"""
         # Create a temporary file
         temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
         temp_file.close()
         
-        # Generate sample audio data (sine wave)
-        t = np.linspace(0, duration_seconds, int(duration_seconds * sample_rate), False)
-        data = np.sin(2 * np.pi * 440 * t) * 32767
-        data = data.astype(np.int16)
+        # Generate silent sample audio data (the tests only read the header)
+        data = np.zeros(int(duration_seconds * sample_rate), dtype=np.int16)
         
-        # Write to WAV file
-        with wave.open(temp_file.name, 'wb') as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(sample_rate)
-            wf.writeframes(data.tobytes())
+        # Write to WAV file: a static 44-byte RIFF header followed by the raw PCM samples
+        num_channels = 1
+        num_bytes = data.nbytes
+        header = struct.pack('<4sI4s4sIHHIIHH4sI',
+                             b'RIFF', 36 + num_bytes, b'WAVE',
+                             b'fmt ', 16, 1, num_channels, sample_rate,
+                             sample_rate * num_channels * 2, num_channels * 2, 16,
+                             b'data', num_bytes)
+        with open(temp_file.name, 'wb', buffering=1 << 20) as fp:
+            fp.write(header)
+            data.tofile(fp)
             
         return temp_file.name
     
@@ -37,17 +63,22 @@ class TestAudioChunking(unittest.TestCase):
         """Test that short audio files are not chunked"""
         # Create a 4-second test WAV file (under the 5-minute threshold)
         test_file = self.create_test_wav(duration_seconds=4)
-        try:
-            # Call the function with a 5-minute (300 second) chunk size
-            result = split_audio_into_chunks(test_file, chunk_duration=300)
-            
-            # Should return a list with just the original file
-            self.assertEqual(len(result), 1)
-            self.assertEqual(result[0], test_file)
-        finally:
-            # Clean up
-            if os.path.exists(test_file):
-                os.unlink(test_file)
+
+        # Call the function with a 5-minute (300 second) chunk size
+        result = split_audio_into_chunks(test_file, chunk_duration=300)
+        
+        # Should return a list with just the original file
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0], test_file)
+    
+    @patch('soundfile.info')
+    def test_known_duration_skips_header_read(self, mock_info):
+        """Test that a duration passed by the caller is used instead of reading the file"""
+        result = split_audio_into_chunks('unused.wav', chunk_duration=300, duration=4.0)
+        
+        # Should return the original file without touching it
+        self.assertEqual(result, ['unused.wav'])
+        mock_info.assert_not_called()
     
     @patch('subprocess.run')
     def test_chunking_for_long_audio(self, mock_subprocess_run):
@@ -56,48 +87,41 @@ class TestAudioChunking(unittest.TestCase):
         mock_process = MagicMock()
         mock_process.returncode = 0
         mock_process.stderr = b''
-        mock_subprocess_run.return_value = mock_process
+
+        def fake_ffmpeg(cmd, **kwargs):
+            # Emulate the segment muxer writing two 5-minute chunks
+            for i in range(2):
+                open(cmd[-1] % i, 'wb').close()
+            return mock_process
+
+        mock_subprocess_run.side_effect = fake_ffmpeg
         
         # Create a test WAV file
         test_file = self.create_test_wav(duration_seconds=600)  # 10 minutes
         
-        try:
-            # Mock wave.open to make it return our desired duration
-            original_wave_open = wave.open
+        # Mock soundfile.info to make it report our desired duration
+        mock_info = MagicMock()
+        mock_info.duration = 600.0  # 10 minutes
+            
+        # Apply the mock
+        with patch('soundfile.info', return_value=mock_info):
+            # Call the function with a 5-minute (300 second) chunk size
+            result = split_audio_into_chunks(test_file, chunk_duration=300)
+            
+            # Should return 2 chunks for a 10-minute file with 5-minute chunks
+            self.assertEqual(len(result), 2)
+            
+            # Check ffmpeg was called once for all chunks
+            self.assertEqual(mock_subprocess_run.call_count, 1)
             
-            def mock_wave_open(file, mode):
-                wav_file = original_wave_open(file, mode)
-                if file == test_file and mode == 'rb':
-                    # Override the getnframes and getframerate methods to fake a 10-minute file
-                    original_getnframes = wav_file.getnframes
-                    original_getframerate = wav_file.getframerate
-                    wav_file.getnframes = lambda: 16000 * 600  # 10 minutes at 16kHz
-                    wav_file.getframerate = lambda: 16000
-                return wav_file
-                
-            # Apply the mock
-            with patch('wave.open', mock_wave_open):
-                # Call the function with a 5-minute (300 second) chunk size
-                result = split_audio_into_chunks(test_file, chunk_duration=300)
-                
-                # Should return 2 chunks for a 10-minute file with 5-minute chunks
-                self.assertEqual(len(result), 2)
-                
-                # Check ffmpeg was called twice (once for each chunk)
-                self.assertEqual(mock_subprocess_run.call_count, 2)
-                
-                # Check ffmpeg parameters
-                first_call_args = mock_subprocess_run.call_args_list[0][0][0]
-                self.assertIn('-ss', first_call_args)
-                self.assertIn('0', first_call_args[first_call_args.index('-ss') + 1])  # First chunk starts at 0
-                
-                second_call_args = mock_subprocess_run.call_args_list[1][0][0]
-                self.assertIn('-ss', second_call_args)
-                self.assertIn('300', second_call_args[second_call_args.index('-ss') + 1])  # Second chunk starts at 300s
-        finally:
-            # Clean up
-            if os.path.exists(test_file):
-                os.unlink(test_file)
+            # Check ffmpeg parameters
+            call_args = mock_subprocess_run.call_args_list[0][0][0]
+            self.assertIn('-f', call_args)
+            self.assertEqual(call_args[call_args.index('-f') + 1], 'segment')  # Uses the segment muxer
+            self.assertIn('-segment_time', call_args)
+            self.assertEqual(call_args[call_args.index('-segment_time') + 1], '300')  # 5-minute segments
+            self.assertIn('-af', call_args)
+            self.assertEqual(call_args[call_args.index('-af') + 1], 'apad=whole_dur=600')  # Last chunk padded
 
 
 if __name__ == '__main__':
@@ -0,0 +1,75 @@
+import os
+import unittest
+
+# Import the classes to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import Segment
+
+try:
+    from diarization import Diarizer, DiarizationResult, SpeakerSegment
+except ImportError:
+    # The diarization module needs torch
+    Diarizer = None
+
+
+@unittest.skipIf(Diarizer is None, "torch is not installed")
+class TestMergeWithTranscription(unittest.TestCase):
+    def setUp(self):
+        # Skip __init__ so no pyannote pipeline is loaded, merging doesn't use it
+        self.diarizer = Diarizer.__new__(Diarizer)
+
+    def merge(self, turns, spans):
+        """Merge speaker turns given as (start, end, speaker) into segments given as (start, end)"""
+        diarization = DiarizationResult(
+            segments=[SpeakerSegment(start=start, end=end, speaker=speaker) for start, end, speaker in turns],
+            num_speakers=len({speaker for _, _, speaker in turns})
+        )
+        segments = [Segment(id=i, start=start, end=end, text="") for i, (start, end) in enumerate(spans)]
+        return self.diarizer.merge_with_transcription(diarization, segments)
+
+    def test_most_overlap_wins(self):
+        """Test that each segment gets the speaker it overlaps the longest"""
+        turns = [(0.0, 4.0, "speaker_SPEAKER_00"), (3.0, 10.0, "speaker_SPEAKER_01")]
+        result = self.merge(turns, [(0.0, 2.0), (2.5, 6.0), (3.5, 9.0)])
+
+        self.assertEqual([segment.speaker for segment in result],
+                         ["speaker_SPEAKER_00", "speaker_SPEAKER_01", "speaker_SPEAKER_01"])
+
+    def test_overlap_is_summed_per_speaker(self):
+        """Test that several short turns of one speaker can outweigh one longer turn"""
+        turns = [
+            (0.0, 1.5, "speaker_SPEAKER_00"),
+            (1.5, 3.5, "speaker_SPEAKER_01"),
+            (3.5, 5.0, "speaker_SPEAKER_00"),
+        ]
+        result = self.merge(turns, [(0.0, 5.0)])
+
+        self.assertEqual(result[0].speaker, "speaker_SPEAKER_00")
+
+    def test_tie_goes_to_earliest_turn(self):
+        """Test that a segment inside two overlapping turns gets the speaker of the earlier turn"""
+        turns = [(0.0, 10.0, "speaker_SPEAKER_01"), (1.0, 10.0, "speaker_SPEAKER_00")]
+        result = self.merge(turns, [(2.0, 3.0)])
+
+        self.assertEqual(result[0].speaker, "speaker_SPEAKER_01")
+
+    def test_no_overlap_is_unknown(self):
+        """Test that segments outside every speaker turn are labelled unknown"""
+        turns = [(0.0, 2.0, "speaker_SPEAKER_00")]
+        result = self.merge(turns, [(2.0, 3.0), (5.0, 6.0)])
+
+        self.assertEqual([segment.speaker for segment in result], ["unknown", "unknown"])
+
+    def test_empty_input(self):
+        """Test that empty diarization or transcription input is passed through"""
+        segments = [Segment(id=0, start=0.0, end=1.0, text="")]
+        result = self.diarizer.merge_with_transcription(DiarizationResult(segments=[], num_speakers=0), segments)
+        self.assertIs(result, segments)
+        self.assertIsNone(result[0].speaker)
+
+        self.assertEqual(self.merge([(0.0, 1.0, "speaker_SPEAKER_00")], []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
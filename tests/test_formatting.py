@@ -0,0 +1,83 @@
+import os
+import unittest
+
+# Import the functions to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import Segment
+from transcription import _format_timestamp, format_srt, format_vtt, format_both, iter_blocks, iter_srt, iter_vtt
+
+
+class TestFormatTimestamp(unittest.TestCase):
+    def test_srt_and_vtt_markers(self):
+        """Test that the decimal marker is placed between seconds and milliseconds"""
+        self.assertEqual(_format_timestamp(3661.5, always_include_hours=True, decimal_marker=','), "1:01:01,500")
+        self.assertEqual(_format_timestamp(3661.5, always_include_hours=True), "1:01:01.500")
+
+    def test_hours_only_when_needed(self):
+        """Test that hours are left out below an hour unless requested"""
+        self.assertEqual(_format_timestamp(1.2345), "00:01.235")
+        self.assertEqual(_format_timestamp(1.2345, always_include_hours=True), "0:00:01.235")
+        self.assertEqual(_format_timestamp(3600.0), "1:00:00.000")
+
+    def test_rounding_carries_into_larger_units(self):
+        """Test that rounding to milliseconds carries instead of producing 60 seconds"""
+        self.assertEqual(_format_timestamp(59.9996), "01:00.000")
+        self.assertEqual(_format_timestamp(3599.9996, always_include_hours=True, decimal_marker=','), "1:00:00,000")
+        self.assertEqual(_format_timestamp(0.0004), "00:00.000")
+        self.assertEqual(_format_timestamp(0.0005), "00:00.001")
+
+
+class TestSubtitleFormats(unittest.TestCase):
+    def setUp(self):
+        self.segments = [
+            Segment(id=0, start=0.0, end=1.5, text=" Hello there "),
+            Segment(id=1, start=59.9996, end=61.25, text="a --> b", speaker="speaker_SPEAKER_00"),
+            Segment(id=2, start=3661.5, end=3662.0, text="Bye", speaker="speaker_SPEAKER_01"),
+        ]
+
+    def test_srt(self):
+        """Test SRT cues, including speaker labels and escaping of the cue arrow in text"""
+        self.assertEqual(format_srt(self.segments), (
+            "1\n0:00:00,000 --> 0:00:01,500\nHello there\n\n"
+            "2\n0:01:00,000 --> 0:01:01,250\n[speaker_SPEAKER_00] a -> b\n\n"
+            "3\n1:01:01,500 --> 1:01:02,000\n[speaker_SPEAKER_01] Bye"
+        ))
+
+    def test_vtt(self):
+        """Test WebVTT cues, including voice tags for speakers"""
+        self.assertEqual(format_vtt(self.segments), (
+            "WEBVTT\n\n"
+            "0:00:00.000 --> 0:00:01.500\nHello there\n\n"
+            "0:01:00.000 --> 0:01:01.250\n<v speaker_SPEAKER_00>a --> b\n\n"
+            "1:01:01.500 --> 1:01:02.000\n<v speaker_SPEAKER_01>Bye"
+        ))
+
+    def test_empty(self):
+        """Test that no segments give an empty SRT and a bare WebVTT header"""
+        self.assertEqual(format_srt([]), "")
+        self.assertEqual(format_vtt([]), "WEBVTT")
+
+    def test_format_both_matches_separate_formatters(self):
+        """Test that the single-pass formatter gives exactly the separate SRT and WebVTT output"""
+        for segments in ([], self.segments[:1], self.segments):
+            self.assertEqual(format_both(segments), (format_srt(segments), format_vtt(segments)))
+
+    def test_streamed_blocks_match_formatters(self):
+        """Test that streaming in blocks gives several blocks that join to the full output"""
+        segments = [Segment(id=i, start=i * 2.0, end=i * 2.0 + 1.5, text=f"Segment {i}", speaker="speaker_SPEAKER_00")
+                    for i in range(2000)]
+
+        srt_blocks = list(iter_blocks(iter_srt(segments), block_size=4096))
+        vtt_blocks = list(iter_blocks(iter_vtt(segments), block_size=4096))
+
+        self.assertGreater(len(srt_blocks), 1)
+        self.assertLess(len(srt_blocks), len(segments))
+        self.assertEqual("".join(srt_blocks), format_srt(segments))
+        self.assertEqual("".join(vtt_blocks), format_vtt(segments))
+        self.assertEqual(list(iter_blocks(iter_srt([]))), [])
+        self.assertEqual(list(iter_blocks(iter_vtt([]))), ["WEBVTT"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,26 +1,58 @@
 import os
 import logging
 import tempfile
-from typing import List, Optional, Dict, Any, Union, Tuple
+from contextlib import nullcontext
+from typing import List, Optional, Dict, Any, Union, Tuple, Iterator
 
-import torch
-import numpy as np
-
-from models import WhisperSegment, TranscriptionResponse
+from models import Segment
 
 logger = logging.getLogger(__name__)
 
-def load_model(model_id: str = "nvidia/parakeet-tdt-0.6b-v3"):
+# Reduced-precision floating point compute types supported on GPU, named as torch dtypes
+_HALF_DTYPES = ("float16", "bfloat16")
+
+# Approximate number of characters sent per item when streaming subtitle exports
+STREAM_BLOCK_SIZE = 64 * 1024
+
+def _enable_cuda_graph_decoding(model) -> None:
+    """
+    Switch the model to NeMo's CUDA-graph batched greedy decoder
+
+    Args:
+        model: The loaded ASR model
+    """
+    try:
+        from omegaconf import open_dict
+
+        decoding_cfg = model.cfg.decoding
+        with open_dict(decoding_cfg):
+            decoding_cfg.strategy = "greedy_batch"
+            decoding_cfg.greedy.loop_labels = True
+            decoding_cfg.greedy.use_cuda_graph_decoder = True
+
+        model.change_decoding_strategy(decoding_cfg)
+        logger.info("CUDA graph decoding enabled")
+    except Exception as e:
+        logger.warning(f"Could not enable CUDA graph decoding: {str(e)}")
+
+def load_model(model_id: str = "nvidia/parakeet-tdt-0.6b-v3", use_cuda_graphs: bool = True,
+               compile_encoder: bool = False, compute_type: str = "auto"):
     """
     Load the ASR model (Parakeet-TDT)
 
     Args:
         model_id: The HuggingFace model ID to load
+        use_cuda_graphs: Whether to decode with CUDA graphs on GPU
+        compile_encoder: Whether to compile the encoder with torch.compile on GPU
+        compute_type: Weight precision (float32, float16 or bfloat16 on GPU, int8 on CPU,
+            or auto to pick the fastest supported floating point type)
 
     Returns:
         The loaded model
     """
     try:
+        # Imported here so formatting helpers and tests don't pay for torch and NeMo
+        import torch
         from nemo.collections.asr.models import EncDecCTCModelBPE
 
         logger.info(f"Loading model {model_id}")
@@ -31,14 +63,59 @@ def load_model(model_id: str = "nvidia/parakeet-tdt-0.6b-v3"):
         if torch.cuda.is_available():
             model = model.cuda()
             logger.info(f"Model loaded on GPU: {torch.cuda.get_device_name(0)}")
+
+            if compute_type == "auto":
+                # bfloat16 needs Ampere or newer, older GPUs still run float16 at full speed
+                compute_type = "bfloat16" if torch.cuda.get_device_capability()[0] >= 8 else "float16"
+
+            if compute_type in _HALF_DTYPES:
+                model = model.to(getattr(torch, compute_type))
+                # Keep the mel-spectrogram preprocessor in full precision
+                model.preprocessor.float()
+                logger.info(f"Model weights converted to {compute_type}")
+            elif compute_type != "float32":
+                logger.warning(f"Compute type {compute_type} not supported on GPU, using float32")
+
+            if use_cuda_graphs:
+                _enable_cuda_graph_decoding(model)
+
+            if compile_encoder:
+                # Compiled graphs are captured per input shape, so this pays off with fixed-length chunks
+                model.encoder = torch.compile(model.encoder, mode="reduce-overhead")
+                logger.info("Encoder compiled with torch.compile")
         else:
             logger.warning("CUDA not available, running on CPU (will be slow)")
 
+            if compute_type == "int8":
+                # Dynamic int8 quantization only has CPU kernels
+                torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+                logger.info("Model linear layers quantized to int8")
+            elif compute_type not in ("float32", "auto"):
+                logger.warning(f"Compute type {compute_type} not supported on CPU, using float32")
+
         return model
     except Exception as e:
         logger.error(f"Error loading model: {str(e)}")
         raise
 
+def _autocast(model):
+    """
+    Get an autocast context matching the model's reduced-precision weights
+
+    Args:
+        model: The loaded ASR model
+
+    Returns:
+        Autocast context for half-precision models, otherwise a no-op context
+    """
+    import torch
+
+    dtype = next(model.encoder.parameters()).dtype
+    if dtype in (torch.float16, torch.bfloat16):
+        # Casts the full-precision features to the weight dtype at each layer
+        return torch.autocast("cuda", dtype=dtype)
+    return nullcontext()
+
 def _format_timestamp(seconds: float, always_include_hours: bool = False,
                      decimal_marker: str = '.') -> str:
     """
@@ -52,43 +129,125 @@ def _format_timestamp(seconds: float, always_include_hours: bool = False,
     Returns:
         Formatted timestamp string
     """
-    hours = int(seconds / 3600)
-    seconds = seconds % 3600
-    minutes = int(seconds / 60)
-    seconds = seconds % 60
+    # Work in whole milliseconds so rounding can carry into seconds, minutes and hours
+    return _fmt_ms(int(seconds * 1000 + 0.5), always_include_hours, decimal_marker)
+
+def _fmt_ms(milliseconds: int, always_include_hours: bool = True,
+            decimal_marker: str = '.') -> str:
+    """
+    Format a timestamp given in whole milliseconds as a string (HH:MM:SS.mmm)
+
+    Args:
+        milliseconds: Time in milliseconds
+        always_include_hours: Always include hours in the output
+        decimal_marker: Marker to use for decimal point
+
+    Returns:
+        Formatted timestamp string
+    """
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
 
-    hours_marker = f"{hours}:" if always_include_hours or hours > 0 else ""
+    hours_marker = f"{hours:d}:" if always_include_hours or hours else ""
 
-    # Handle different format requirements (SRT vs VTT)
-    if decimal_marker == ',':  # SRT format
-        return f"{hours_marker}{minutes:02d}:{seconds:06.3f}".replace('.', decimal_marker)
-    else:  # VTT format
-        return f"{hours_marker}{minutes:02d}:{seconds:06.3f}"
+    # The decimal marker differs between SRT (',') and VTT ('.')
+    return f"{hours_marker}{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
 
-def format_srt(segments: List[WhisperSegment]) -> str:
+def iter_srt(segments: List[Segment]) -> Iterator[str]:
     """
-    Format segments as SRT subtitle format
+    Generate SRT subtitle cues one at a time, so long transcripts can be streamed
 
     Args:
         segments: List of transcription segments
 
-    Returns:
-        SRT formatted string
+    Yields:
+        SRT formatted cues, separated by blank lines
     """
-    srt_content = ""
+    # Segments in one call share a type, so check for speakers once and bind the formatter locally
+    has_speaker = bool(segments) and hasattr(segments[0], "speaker")
+    fmt = _format_timestamp
     for i, segment in enumerate(segments):
         segment_id = i + 1
-        start = _format_timestamp(segment.start, always_include_hours=True, decimal_marker=',')
-        end = _format_timestamp(segment.end, always_include_hours=True, decimal_marker=',')
-        text = segment.text.strip().replace('-->', '->')
+        start = fmt(segment.start, always_include_hours=True, decimal_marker=',')
+        end = fmt(segment.end, always_include_hours=True, decimal_marker=',')
+        text = segment.text
+        # NeMo text is usually already stripped, so only allocate new strings when needed
+        if text and (text[0].isspace() or text[-1].isspace()):
+            text = text.strip()
+        if '-->' in text:
+            text = text.replace('-->', '->')
 
         # Format for SRT (with speaker if available)
-        speaker_prefix = f"[{segment.speaker}] " if hasattr(segment, "speaker") and segment.speaker else ""
-        srt_content += f"{segment_id}\n{start} --> {end}\n{speaker_prefix}{text}\n\n"
+        speaker = segment.speaker if has_speaker else None
+        speaker_prefix = f"[{speaker}] " if speaker else ""
+        cue = f"{segment_id}\n{start} --> {end}\n{speaker_prefix}{text}"
+        yield cue if i == 0 else f"\n\n{cue}"
+
+def iter_vtt(segments: List[Segment]) -> Iterator[str]:
+    """
+    Generate the WebVTT header and cues one at a time, so long transcripts can be streamed
+
+    Args:
+        segments: List of transcription segments
+
+    Yields:
+        WebVTT header followed by formatted cues, separated by blank lines
+    """
+    has_speaker = bool(segments) and hasattr(segments[0], "speaker")
+    fmt = _format_timestamp
+    yield "WEBVTT"
+    for segment in segments:
+        start = fmt(segment.start, always_include_hours=True)
+        end = fmt(segment.end, always_include_hours=True)
+        text = segment.text
+        if text and (text[0].isspace() or text[-1].isspace()):
+            text = text.strip()
+
+        # Format for VTT (with speaker if available)
+        speaker = segment.speaker if has_speaker else None
+        speaker_prefix = f"<v {speaker}>" if speaker else ""
+        yield f"\n\n{start} --> {end}\n{speaker_prefix}{text}"
 
-    return srt_content.strip()
+def iter_blocks(parts: Iterator[str], block_size: int = STREAM_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Group small strings into blocks of roughly block_size characters for streaming
+
+    Streaming one cue per item costs a threadpool hop and a response frame per cue,
+    so long exports are sent in large blocks instead
+
+    Args:
+        parts: Strings to group, such as the cues from iter_srt or iter_vtt
+        block_size: Number of characters after which a block is yielded
 
-def format_vtt(segments: List[WhisperSegment]) -> str:
+    Yields:
+        Concatenated blocks, which join back to exactly the input
+    """
+    block = []
+    size = 0
+    for part in parts:
+        block.append(part)
+        size += len(part)
+        if size >= block_size:
+            yield "".join(block)
+            block = []
+            size = 0
+    if block:
+        yield "".join(block)
+
+def format_srt(segments: List[Segment]) -> str:
+    """
+    Format segments as SRT subtitle format
+
+    Args:
+        segments: List of transcription segments
+
+    Returns:
+        SRT formatted string
+    """
+    return "".join(iter_srt(segments))
+
+def format_vtt(segments: List[Segment]) -> str:
     """
     Format segments as WebVTT subtitle format
 
@@ -98,20 +257,125 @@ def format_vtt(segments: List[WhisperSegment]) -> str:
     Returns:
         WebVTT formatted string
     """
-    vtt_content = "WEBVTT\n\n"
+    return "".join(iter_vtt(segments))
+
+def format_both(segments: List[Segment]) -> Tuple[str, str]:
+    """
+    Format segments as both SRT and WebVTT in a single pass
+
+    Args:
+        segments: List of transcription segments
+
+    Returns:
+        Tuple of (SRT formatted string, WebVTT formatted string)
+    """
+    srt_parts = []
+    vtt_parts = ["WEBVTT"]
+    has_speaker = bool(segments) and hasattr(segments[0], "speaker")
+    fmt = _fmt_ms
     for i, segment in enumerate(segments):
-        start = _format_timestamp(segment.start, always_include_hours=True)
-        end = _format_timestamp(segment.end, always_include_hours=True)
-        text = segment.text.strip()
+        # Timestamps are formatted once, SRT only swaps the decimal marker
+        start = fmt(int(segment.start * 1000 + 0.5))
+        end = fmt(int(segment.end * 1000 + 0.5))
+        srt_start = f"{start[:-4]},{start[-3:]}"
+        srt_end = f"{end[:-4]},{end[-3:]}"
 
-        # Format for VTT (with speaker if available)
-        speaker_prefix = f"<v {segment.speaker}>" if hasattr(segment, "speaker") and segment.speaker else ""
-        vtt_content += f"{start} --> {end}\n{speaker_prefix}{text}\n\n"
+        text = segment.text
+        if text and (text[0].isspace() or text[-1].isspace()):
+            text = text.strip()
+        srt_text = text.replace('-->', '->') if '-->' in text else text
+
+        speaker = segment.speaker if has_speaker else None
+        srt_prefix = f"[{speaker}] " if speaker else ""
+        vtt_prefix = f"<v {speaker}>" if speaker else ""
+
+        srt_parts.append(f"{i + 1}\n{srt_start} --> {srt_end}\n{srt_prefix}{srt_text}")
+        vtt_parts.append(f"{start} --> {end}\n{vtt_prefix}{text}")
+
+    return "\n\n".join(srt_parts), "\n\n".join(vtt_parts)
+
+def _result_to_segments(result) -> Tuple[str, List[Segment]]:
+    """
+    Convert a single NeMo transcription result into text and segments
 
-    return vtt_content.strip()
+    Args:
+        result: Hypothesis returned by the model's transcribe method
+
+    Returns:
+        Tuple of (transcription text, list of Segment objects)
+    """
+    text = result.text
+
+    # Check if we have timestamp information
+    if hasattr(result, 'timestamp') and 'segment' in result.timestamp:
+        # Build the segments in one pass, positional arguments follow the Segment field order.
+        # NeMo may return NumPy or tensor scalars, which orjson cannot serialize, so pass plain floats
+        segments = [
+            Segment(i, float(stamp['start']), float(stamp['end']), stamp['segment'])
+            for i, stamp in enumerate(result.timestamp['segment'])
+        ]
+    else:
+        # If no segments available, create a single segment for the entire chunk
+        segments = [Segment(
+            id=0,
+            start=0.0,
+            end=len(text.split()) / 2.0,  # Rough estimate based on word count
+            text=text
+        )]
+
+    return text, segments
+
+def transcribe_audio_chunks(model, audio_paths: List[str], language: Optional[str] = None,
+                           word_timestamps: bool = False,
+                           batch_size: int = 4) -> Iterator[Tuple[str, str, List[Segment]]]:
+    """
+    Transcribe audio chunks in batches using the Parakeet-TDT model
+
+    Args:
+        model: The loaded ASR model
+        audio_paths: Paths to the audio files
+        language: Optional language code
+        word_timestamps: Whether to generate word-level timestamps
+        batch_size: Number of chunks transcribed per model call
+
+    Yields:
+        Tuple of (audio path, transcription text, list of Segment objects), in input order
+    """
+    import torch
+
+    for i in range(0, len(audio_paths), batch_size):
+        batch = audio_paths[i:i + batch_size]
+
+        try:
+            # Use the NeMo model to transcribe the whole batch in one call
+            with torch.inference_mode(), _autocast(model):
+                transcription = model.transcribe(
+                    batch,
+                    batch_size=len(batch),
+                    timestamps=True  # Always request timestamps for segmentation
+                )
+
+            # Extract the text from the result
+            if not transcription or len(transcription) == 0:
+                logger.warning(f"No transcription generated for {batch}")
+                results = [("", []) for _ in batch]
+            else:
+                results = [_result_to_segments(result) for result in transcription]
+                if len(results) != len(batch):
+                    # Callers rely on one result per input to compute chunk offsets,
+                    # so pad missing chunks with empty results instead of shortening the batch
+                    logger.warning(f"Got {len(results)} transcriptions for {len(batch)} chunks in {batch}")
+                    results = results[:len(batch)] + [("", [])] * (len(batch) - len(results))
+
+        except Exception as e:
+            logger.error(f"Error transcribing audio chunks: {str(e)}")
+            results = [("", []) for _ in batch]
+
+        for audio_path, (text, segments) in zip(batch, results):
+            yield audio_path, text, segments
 
 def transcribe_audio_chunk(model, audio_path: str, language: Optional[str] = None,
-                          word_timestamps: bool = False) -> Tuple[str, List[WhisperSegment]]:
+                          word_timestamps: bool = False) -> Tuple[str, List[Segment]]:
     """
     Transcribe a single audio chunk using the Parakeet-TDT model
 
@@ -122,48 +386,13 @@ def transcribe_audio_chunk(model, audio_path: str, language: Optional[str] = Non
         word_timestamps: Whether to generate word-level timestamps
 
     Returns:
-        Tuple of (transcription text, list of WhisperSegment objects)
+        Tuple of (transcription text, list of Segment objects)
     """
-    try:
-        # Use the NeMo model to transcribe audio
-        with torch.no_grad():
-            # Simply pass the audio path(s) as a list to the transcribe method
-            transcription = model.transcribe(
-                [audio_path],
-                timestamps=True  # Always request timestamps for segmentation
-            )
-
-        # Extract the text from the result
-        if not transcription or len(transcription) == 0:
-            logger.warning(f"No transcription generated for {audio_path}")
-            return "", []
-
-        result = transcription[0]  # Get the first result
-        text = result.text
-
-        # Create segments from the timestamp information if available
-        segments = []
-
-        # Check if we have timestamp information
-        if hasattr(result, 'timestamp') and 'segment' in result.timestamp:
-            for i, stamp in enumerate(result.timestamp['segment']):
-                segments.append(WhisperSegment(
-                    id=i,
-                    start=stamp['start'],
-                    end=stamp['end'],
-                    text=stamp['segment']
-                ))
-        else:
-            # If no segments available, create a single segment for the entire chunk
-            segments.append(WhisperSegment(
-                id=0,
-                start=0.0,
-                end=len(text.split()) / 2.0,  # Rough estimate based on word count
-                text=text
-            ))
-
-        return text, segments
-
-    except Exception as e:
-        logger.error(f"Error transcribing audio chunk: {str(e)}")
-        return "", []
+    _, text, segments = next(transcribe_audio_chunks(
+        model,
+        [audio_path],
+        language=language,
+        word_timestamps=word_timestamps,
+        batch_size=1
+    ))
+    return text, segments